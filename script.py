@@ -1,129 +1,660 @@
 import subprocess
+import argparse
 import os
 import re
 import tarfile
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
 import concurrent.futures
 import openai  # GPT 사용을 위한 openai 라이브러리
-from bs4 import BeautifulSoup
+from lxml import etree
 import logging
 import shutil
-import json
+import orjson
+import hashlib
 import time
+import tempfile
+import functools
+import itertools
+import random
+import contextlib
+import collections
+import io
+import tiktoken
 
 # 로그 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# HTTP 클라이언트 라이브러리는 요청마다 INFO 로그를 남기므로 경고 이상만 출력
+for noisy_logger in ("openai", "httpx", "httpcore", "urllib3"):
+    logging.getLogger(noisy_logger).setLevel(logging.WARNING)
+
+# 번역 결과 캐시 디렉토리 및 사용 모델
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "arxiv-translator")
+TRANSLATION_MODEL = "gpt-4o-mini"
+
+# 요청 한도(429), 연결 오류/시간 초과, 5xx 응답 시 번역 요청의 재시도 횟수와 첫 대기 시간(초)
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_BACKOFF_SECONDS = 1.0
+
+# OpenAI 클라이언트의 요청 제한 시간(초)과 SDK 자체 재시도 횟수.
+# 번역 요청은 request_translation에서 SDK 재시도를 끄고 직접 재시도하므로, 이 횟수는 Batch API 클라이언트에만 적용됨
+OPENAI_TIMEOUT_SECONDS = 60.0
+OPENAI_MAX_RETRIES = 3
+
+# 대기 후 다시 보내면 성공할 수 있는 OpenAI 오류 (APITimeoutError는 APIConnectionError의 하위 클래스)
+TRANSIENT_API_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# arXiv API 응답(Atom 피드)의 XML 네임스페이스
+ARXIV_ATOM_NS = {'atom': 'http://www.w3.org/2005/Atom'}
+
+# LaTeX 컴파일에 사용할 RAM 디스크(tmpfs) 경로
+RAM_DISK_DIR = "/dev/shm"
+
+# tar 스트림 추출/캐시 기록 시 한 번에 읽는 크기 (기본 10 KiB 레코드 단위보다 크게 읽어 read/write 호출을 줄임)
+TAR_STREAM_BUFSIZE = 1 << 20
+
+# 큰 .tex 파일을 다시 쓸 때 한 번에 읽는 크기 (파일 전체를 메모리에 올리지 않음)
+TEX_COPY_BUFSIZE = 1 << 20
+
+# 청크마다 호출되는 정규식은 모듈 로드 시 한 번만 컴파일
+# \begin{CJK*}{..}{..}와 \end{CJK*}를 하나의 정규식으로 묶어 한 번의 치환으로 제거
+_CJK_ENV_RE = re.compile(r'\\begin\{CJK\*\}\{.*?\}\{.*?\}|\\end\{CJK\*\}')
+# 메인 파일 판별용 키워드를 한 번의 탐색으로 확인 (그룹 1: \documentclass, 그룹 2: 메인 파일 표지)
+_MAIN_RE = re.compile(r'(\\documentclass)|(\\begin\{document\}|\\usepackage|\\title|\\author)')
+
+# 번역할 문장이 없는 LaTeX 구조 명령만으로 이루어진 줄
+# (\section, \caption 등 본문이 들어가는 명령과, 본문에 문장이 있을 수 있는 \newcommand 등의 정의 명령은 제외)
+_LATEX_ONLY_RE = re.compile(
+    r'(?:\\(?:documentclass|usepackage|RequirePackage|begin|end|label|input|include|includegraphics'
+    r'|bibliographystyle|bibliography|maketitle|tableofcontents|centering|newpage|clearpage|appendix'
+    r'|noindent|par|vspace|hspace|vskip|hline|toprule|midrule|bottomrule|DeclareMathOperator'
+    r'|setlength|addtolength)\*?'
+    r'(?:\[[^\]]*\]|\{[^{}]*\})*\s*)+(?:%.*)?$'
+)
+
+# 제거 대상 CJK 관련 줄의 접두사
+_CJK_PREFIXES = (
+    r'\usepackage{CJKutf8}',
+    r'\usepackage{kotex}',
+    r'\begin{CJK}',
+    r'\end{CJK}',
+    r'\CJKfamily',
+    r'\CJK@',
+    r'\CJKrmdefault',
+    r'\CJKsfdefault',
+    r'\CJKttdefault',
+)
+# 위 접두사로 시작하는 줄 전체를 파일 내용에서 한 번에 지우는 정규식
+_CJK_LINE_RE = re.compile(r'^[ \t]*(?:' + '|'.join(map(re.escape, _CJK_PREFIXES)) + r').*\n?', re.MULTILINE)
+_DOCUMENTCLASS_LINE_RE = re.compile(r'^\\documentclass.*\n?', re.MULTILINE)
+
+# 청크 분할 시 환경 중첩 추적용 (document 환경은 파일 전체를 감싸므로 제외)
+_ENV_BEGIN_RE = re.compile(r'\\begin\{(?!document\})')
+_ENV_END_RE = re.compile(r'\\end\{(?!document\})')
+_LATEX_COMMENT_RE = re.compile(r'(?<!\\)%.*')
+# 번역할 문장이 있는지 판단할 때 지우는 부분: 수식, 참조/파일/레이아웃 명령과 그 인자, 나머지 명령 이름
+# (\newcommand 등의 정의 본문에는 문장이 들어 있을 수 있으므로 인자를 지우지 않음)
+_MATH_RE = re.compile(
+    r'(?<!\\)\$\$.*?(?<!\\)\$\$|(?<!\\)\$[^$]*(?<!\\)\$|\\\[.*?\\\]|\\\(.*?\\\)'
+    r'|\\begin\{(equation|align|gather|multline|eqnarray|math|displaymath)(\*?)\}.*?\\end\{\1\2\}',
+    re.DOTALL
+)
+_NON_PROSE_COMMAND_RE = re.compile(
+    r'\\(?:begin|end|label|ref|eqref|autoref|pageref|cref|Cref|cite\w*|url|includegraphics|input|include'
+    r'|usepackage|RequirePackage|usetikzlibrary|documentclass|bibliographystyle|bibliography'
+    r'|DeclareMathOperator|setlength|addtolength|vspace|hspace)\*?(?:\[[^\]]*\]|\{[^{}]*\})*'
+)
+_COMMAND_NAME_RE = re.compile(r'\\(?:[A-Za-z@]+\*?|.)')
+_PROSE_WORD_RE = re.compile(r'[^\W\d_]{3,}')
+# tikz 그림의 노드 이름/옵션은 문장이 아니므로 파일 단위 판단 시 환경 전체를 제외
+_TIKZPICTURE_RE = re.compile(r'\\begin\{tikzpicture\}.*?\\end\{tikzpicture\}', re.DOTALL)
+
+# 청크를 자르기 좋은 의미 단위 경계: 빈 줄(문단 경계) 또는 섹션 명령으로 시작하는 줄
+_SECTION_BREAK_RE = re.compile(r'\s*$|\s*\\(?:part|chapter|section|subsection|subsubsection|paragraph)\b')
+
+# 한 번의 탐색으로 읽은 .tex 파일 내용과 메인 파일 판별 정보
+TexFile = collections.namedtuple('TexFile', 'path size lines has_documentclass has_main_markers')
+
+
+class TranslationCache:
+    """
+    Content-addressed on-disk cache of translated chunks, evicted in LRU order by mtime.
+    Entries are sharded into subdirectories by the first two hex digits of the key
+    so no single directory grows to tens of thousands of files.
+
+    A bounded in-memory LRU sits in front of the disk so chunks repeated within a
+    run (blank-line runs, boilerplate) are served without touching the filesystem.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_size_mb: int = 256, memory_entries: int = 4096):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.memory_entries = memory_entries
+        self._memory = collections.OrderedDict()
+
+    def make_key(self, text: str, target_language: str, model: str, paper_title: str,
+                 system_prompt: str = '') -> str:
+        """Hashes everything that influences the translation (including the prompt) into a cache key."""
+        payload = '\0'.join((text, target_language, model, paper_title, system_prompt))
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """Yields the cache entry files, including flat entries written before sharding."""
+        try:
+            top_entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in top_entries:
+            try:
+                if entry.is_dir() and len(entry.name) == 2:
+                    # 다른 실행이 동시에 정리 중일 수 있으므로 샤드 디렉토리를 읽지 못하면 건너뜀
+                    yield from [sub_entry for sub_entry in os.scandir(entry.path)
+                                if sub_entry.is_file() and sub_entry.name.endswith('.json')]
+                elif entry.is_file() and entry.name.endswith('.json'):
+                    yield entry
+            except OSError:
+                continue
+
+    def _remember(self, key: str, lines: list):
+        self._memory[key] = lines
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Returns the cached translated lines, or None on a miss."""
+        lines = self._memory.get(key)
+        if lines is not None:
+            self._memory.move_to_end(key)
+            return lines
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                lines = orjson.loads(f.read())["lines"]
+            os.utime(path)  # LRU 순서를 위해 접근 시각 갱신
+            self._remember(key, lines)
+            return lines
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def put(self, key: str, lines: list):
+        """Stores translated lines atomically so concurrent readers never see partial files."""
+        self._remember(key, lines)
+        tmp_path = None
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps({"lines": lines}))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed to write translation cache entry: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """Drops the least recently used entries until the cache fits in max_size_bytes."""
+        stats = []
+        for entry in self._entries():
+            try:
+                stats.append((entry.path, entry.stat()))
+            except OSError:
+                continue  # 다른 실행이 이미 지운 항목
+        total_size = sum(st.st_size for _, st in stats)
+        if total_size <= self.max_size_bytes:
+            return
+
+        for path, st in sorted(stats, key=lambda item: item[1].st_mtime):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= st.st_size
+            if total_size <= self.max_size_bytes:
+                break
+        logging.info(f"Translation cache evicted down to {total_size / (1024 * 1024):.1f} MB.")
+
+
+translation_cache = TranslationCache()
+
+
+class PdfCache:
+    """Caches compiled PDFs keyed by the hash of the translated .tex sources, expiring entries after a TTL."""
+
+    def __init__(self, cache_dir: str = os.path.join(CACHE_DIR, "pdf"), ttl_seconds: int = 24 * 60 * 60):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+
+    def make_key(self, directory: str, arxiv_id: str, font_name: str) -> str:
+        """Hashes every .tex file under directory (in a stable order) together with the compile settings."""
+        digest = hashlib.blake2b(f"{arxiv_id}\0{font_name}".encode('utf-8'), digest_size=16)
+        tex_paths = []
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.endswith(".tex"):
+                    tex_paths.append(os.path.join(root, file))
+
+        for tex_path in sorted(tex_paths):
+            digest.update(os.path.relpath(tex_path, directory).encode('utf-8') + b'\0')
+            with open(tex_path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, key: str):
+        """Returns the path of the cached PDF, or None on a miss."""
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def put(self, key: str, pdf_path: str):
+        """Copies a compiled PDF into the cache atomically."""
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(pdf_path, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning(f"Failed to write PDF cache entry: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def sweep(self):
+        """Removes cached PDFs older than the TTL."""
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except FileNotFoundError:
+            return
+
+        expire_before = time.time() - self.ttl_seconds
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < expire_before:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+
+pdf_cache = PdfCache()
+
+
+class CacheSink:
+    """Binary file wrapper that gives up caching (instead of raising) when a write to the cache fails."""
+
+    def __init__(self, file):
+        self.file = file
+        self.failed = False
+
+    def write(self, data: bytes):
+        if self.failed:
+            return
+        try:
+            self.file.write(data)
+        except OSError as e:
+            logging.warning(f"Failed to write HTTP cache entry, continuing without caching: {e}")
+            self.failed = True
+
+    def close(self):
+        try:
+            self.file.close()
+        except OSError as e:
+            logging.warning(f"Failed to write HTTP cache entry, continuing without caching: {e}")
+            self.failed = True
+
+
+class HttpCache:
+    """
+    Keeps downloaded responses with their ETag/Last-Modified validators so re-runs can send conditional requests.
+    Entries not used for ttl_seconds are removed by sweep.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join(CACHE_DIR, "http"), ttl_seconds: int = 7 * 24 * 60 * 60):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+
+    def _paths(self, url: str):
+        key = hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.body"), os.path.join(self.cache_dir, f"{key}.json")
+
+    def body_path(self, url: str) -> str:
+        return self._paths(url)[0]
+
+    def open_body(self, url: str):
+        """Opens the cached body of a URL (after a 304) and marks the entry as recently used."""
+        body_path = self.body_path(url)
+        os.utime(body_path)
+        return open(body_path, 'rb')
+
+    def conditional_headers(self, url: str) -> dict:
+        """Returns If-None-Match/If-Modified-Since headers for a cached URL, or an empty dict."""
+        body_path, meta_path = self._paths(url)
+        if not os.path.exists(body_path):
+            return {}
+        try:
+            with open(meta_path, 'rb') as f:
+                validators = orjson.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    @contextlib.contextmanager
+    def open_writer(self, url: str, response_headers):
+        """
+        Yields a binary file that receives the response body, or None when the
+        response carries no validators. The entry is only committed if the block
+        completes without an exception.
+        """
+        validators = {'etag': response_headers.get('ETag'), 'last_modified': response_headers.get('Last-Modified')}
+        if not any(validators.values()):
+            yield None
+            return
+
+        body_path, meta_path = self._paths(url)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        except OSError as e:
+            logging.warning(f"Failed to create HTTP cache entry, continuing without caching: {e}")
+            yield None
+            return
+
+        sink = CacheSink(os.fdopen(fd, 'wb'))
+        try:
+            yield sink
+            sink.close()
+            if not sink.failed:
+                try:
+                    os.replace(tmp_path, body_path)
+                    with open(meta_path, 'wb') as f:
+                        f.write(orjson.dumps(validators))
+                except OSError as e:
+                    logging.warning(f"Failed to commit HTTP cache entry: {e}")
+        finally:
+            sink.close()
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def sweep(self):
+        """Removes entries (body and validators together) and leftover temp files older than the TTL."""
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+
+        expire_before = time.time() - self.ttl_seconds
+        for entry in entries:
+            try:
+                if not entry.is_file() or entry.stat().st_mtime >= expire_before:
+                    continue
+                # 검증자 파일은 본문과 함께 지우고, 본문이 없는 경우에만 단독으로 지움
+                if entry.name.endswith('.json') and os.path.exists(entry.path[:-len('.json')] + '.body'):
+                    continue
+                os.remove(entry.path)
+                if entry.name.endswith('.body'):
+                    meta_path = entry.path[:-len('.body')] + '.json'
+                    if os.path.exists(meta_path):
+                        os.remove(meta_path)
+            except OSError:
+                continue
+
+
+class TeeReader:
+    """Read-only file wrapper that copies everything read from source into a CacheSink, dropping it if caching fails."""
+
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        if self.sink is not None:
+            self.sink.write(data)
+            if self.sink.failed:
+                self.sink = None  # 캐시 기록에 실패해도 다운로드는 계속
+        return data
+
+
+http_cache = HttpCache()
+
+
+def make_http_session() -> requests.Session:
+    """연결을 재사용하고 일시적인 오류(429/5xx)는 자동으로 재시도하는 HTTP 세션 생성"""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                  allowed_methods=["GET"], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# arXiv API와 소스 다운로드가 같은 세션을 써서 TCP/TLS 연결을 재사용 (여러 논문을 처리할 때도 유지)
+http_session = make_http_session()
 
 def extract_arxiv_id(url: str) -> str:
     """URL에서 arXiv ID를 추출"""
-    logging.debug(f"Extracting arXiv ID from URL: {url}")
+    logging.debug("Extracting arXiv ID from URL: %s", url)
     arxiv_id = url.split('/')[-1] if 'arxiv.org' in url else url
-    logging.debug(f"Extracted arXiv ID: {arxiv_id}")
+    logging.debug("Extracted arXiv ID: %s", arxiv_id)
     return arxiv_id
 
 
 def remove_latex_commands(text: str) -> str:
+    # 대부분의 줄에는 CJK* 환경이 없으므로 정규식 치환 없이 그대로 반환
+    if 'CJK*' not in text:
+        return text
+
     # CJK* 관련 내용을 자동으로 대체
-    text = re.sub(r'\\begin{CJK\*}\{.*?\}\{.*?\}', '', text)
-    text = re.sub(r'\\end{CJK\*}', '', text)
+    return _CJK_ENV_RE.sub('', text)
 
-    return text
 
+# 시스템 프롬프트는 모든 청크에서 바이트 단위로 동일해야 OpenAI의 자동 프롬프트 캐싱(1024 토큰 이상 접두사)이 적용됨.
+# 논문별로 달라지는 제목/초록은 user 메시지 앞부분으로 옮겨, 같은 논문의 청크끼리는 그 부분까지 캐시를 공유한다.
+SYSTEM_PROMPT_TEMPLATE = r"""You are an AI assistant specialized in translating academic papers in LaTeX format to {target_language}. Your task is to translate the content accurately while preserving the LaTeX structure and formatting. Pay close attention to technical terms and follow these guidelines meticulously.
+Translation Instructions:
 
-def translate_text(text: str, paper_info: dict, chunk_size: int, target_language: str = "Korean") -> str:
-    """Translates text using GPT API while preserving LaTeX structure and formatting."""
-    paper_title = paper_info.get('title', '')
-    paper_abstract = paper_info.get('abstract', '')
+1. Translate the main content into {target_language}, preserving the structure and flow of the original text. Use an academic and formal tone appropriate for scholarly publications in {target_language}. Do not insert any arbitrary line breaks in the translated content.
 
-    cleaned_text = remove_latex_commands(text)
-    logging.debug("Sending translation request to GPT API.")
+2. Technical Terms:
+   a. Retain well-known technical terms, product names, or specialized concepts (e.g., Few-Shot Learning) in English.
+   b. Do not translate examples, especially if they contain technical content or are essential for context.
 
-    retry_attempts = 3  # Number of retry attempts
-    for attempt in range(retry_attempts):
+3. LaTeX Commands:
+   - Do not translate LaTeX commands, functions, environments, or specific LaTeX-related keywords (e.g., \section{{}}, \begin{{}}, \end{{}}, \cite{{}}, \ref{{}}, or TikZ syntax such as /tikz/fill, /tikz/draw, etc.) into {target_language}. They must be output exactly as they are.
+   - Only translate the provided text without making any additional modifications.
+
+4. Citation and Reference Keys:
+   - Ensure all citation keys within \cite{{}} and reference keys within \ref{{}} remain unchanged. Do not translate or modify these keys.
+
+5. URLs and DOIs:
+   - Do not translate URLs, DOIs, or any other links. Keep them in their original form.
+
+6. Mathematical Equations and Formulas:
+   - Maintain all mathematical equations and formulas as they are in the original LaTeX. Do not translate code or LaTeX mathematical notation.
+
+7. Names:
+   - Do not translate author names, personal names, or any other individual names. Keep these in their original English form.
+
+8. Consistency:
+   - Ensure consistent terminology throughout the translation.
+
+9. Protection of LaTeX Commands:
+    - Preserve line breaks (\\) and other formatting commands exactly as they appear in the original text.
+
+10. Avoid Misleading Translations:
+    - Do not translate technical terms, product names, specialized concepts, examples, or personal names where translation could lead to a loss of meaning or context.
+
+11. JSON Structure:
+    - The input is a JSON object whose "chunks" field is an array of chunks, and each chunk is an array of lines.
+    - Translate every chunk line by line and return the chunks in the same order. Each output chunk must contain exactly as many lines as the corresponding input chunk.
+    For example:
+      ```json
+      {{"translate": {{
+        "chunks": [
+          {{"lines": ["Translated Line 1", "Translated Line 2"]}},
+          {{"lines": ["Translated Line 3"]}}
+      ]}}}}
+      ```
+
+12. Input Format:
+    - The user message starts with a "### Paper Info:" section giving the title and abstract of the paper for context. Do not translate or output it.
+    - The chunks to translate follow the "### INPUT:" marker as a JSON object.
+
+### Response Example:
+#INPUT:
+{{"chunks": [["\n", "\documentclass{{article}} % For LaTeX2e\n", "\usepackage{{colm2024_conference}}\n"], ["\n", "\usepackage{{microtype}}\n"]]}}
+#OUTPUT:
+{{"translate": {{"chunks": [{{"lines": ["\n", "\documentclass{{article}} % For LaTeX2e\n", "\usepackage{{colm2024_conference}}\n"]}}, {{"lines": ["\n", "\usepackage{{microtype}}\n"]}}]}}}}
+
+### VERY IMPORTANT
+- DO NOT translate comments starting with "%" by arbitrarily merging them.
+- DO NOT break a sentence into multiple paragraphs.
+- Output the translated result in JSON format, without any other explanation.
+- It should be translated and output in the same form as the unconditional input.
+- Translate and output even single characters like '\n', '{{', '/', '%', etc.
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_system_prompt(target_language: str) -> str:
+    """Returns the static system prompt for the target language (built once per language)."""
+    return SYSTEM_PROMPT_TEMPLATE.format(target_language=target_language)
+
+
+def build_user_message(paper_info: dict, text: str) -> str:
+    """Prefixes the chunk with the paper info so only the tail of the prompt differs between chunks."""
+    return (f"### Paper Info:\n"
+            f"- Title : {paper_info.get('title', '')}\n"
+            f"- Abstract : {paper_info.get('abstract', '')}\n\n"
+            f"### INPUT:\n{text}")
+
+
+def make_prompt_cache_key(paper_info: dict, target_language: str) -> str:
+    """
+    Routing hint for OpenAI prompt caching: every chunk of one paper shares the system
+    prompt and the paper info prefix, so their requests should land on the same cache.
+    """
+    return hashlib.blake2b(f"{target_language}\0{paper_info.get('title', '')}".encode('utf-8'),
+                           digest_size=8).hexdigest()
+
+
+def make_openai_client(use_async: bool = True):
+    """Creates an OpenAI client with the shared timeout and retry settings (one connection pool per client)."""
+    client_class = openai.AsyncOpenAI if use_async else openai.OpenAI
+    return client_class(api_key=openai.api_key, timeout=OPENAI_TIMEOUT_SECONDS, max_retries=OPENAI_MAX_RETRIES)
+
+
+def build_translation_messages(chunks: list, paper_info: dict, target_language: str) -> list:
+    """Builds the chat messages that ask for the translation of the given chunks."""
+    return [
+        {"role": "system", "content": get_system_prompt(target_language)},
+        {"role": "user", "content": build_user_message(paper_info, orjson.dumps({"chunks": chunks}).decode())}
+    ]
+
+
+def parse_translation_content(translated_content: str) -> list:
+    """Extracts the translated line lists from a JSON reply (None for malformed chunks)."""
+    translation_result = orjson.loads(translated_content)
+    return [chunk.get('lines') if isinstance(chunk, dict) else None
+            for chunk in translation_result["translate"]['chunks']]
+
+
+async def request_translation(client: openai.AsyncOpenAI, chunks: list, paper_info: dict,
+                              target_language: str = "Korean") -> list:
+    """
+    Sends the given chunks to the GPT API in a single request and returns the translated line lists in order.
+
+    The response is streamed so a reply that already holds more chunks than were
+    requested is abandoned immediately instead of waiting for it to finish.
+    """
+    messages = build_translation_messages(chunks, paper_info, target_language)
+
+    # 요청 한도(429)나 일시적 오류(연결/시간 초과/5xx)면 지수적으로 늘어나는 대기 후 재시도
+    # (동시 요청이 한꺼번에 재시도하지 않도록 지터 추가)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4o-mini",
+            # SDK 자체 재시도는 끄고 이 루프에서만 재시도해 재시도 계층이 겹치지 않도록 함
+            stream = await client.with_options(max_retries=0).chat.completions.create(
+                model=TRANSLATION_MODEL,
                 response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": f"""
-                        You are an AI assistant specialized in translating academic papers in LaTeX format to {target_language}. Your task is to translate the content accurately while preserving the LaTeX structure and formatting. Pay close attention to technical terms and follow these guidelines meticulously.
-                        Translation Instructions:
-
-                        1. Translate the main content into {target_language}, preserving the structure and flow of the original text. Use an academic and formal tone appropriate for scholarly publications in {target_language}. Do not insert any arbitrary line breaks in the translated content.
-
-                        2. Technical Terms:
-                           a. Retain well-known technical terms, product names, or specialized concepts (e.g., Few-Shot Learning) in English.
-                           b. Do not translate examples, especially if they contain technical content or are essential for context.
-
-                        3. LaTeX Commands:
-                           - Do not translate LaTeX commands, functions, environments, or specific LaTeX-related keywords (e.g., \section{{}}, \begin{{}}, \end{{}}, \cite{{}}, \ref{{}}, or TikZ syntax such as /tikz/fill, /tikz/draw, etc.) into {target_language}. They must be output exactly as they are.
-                           - Only translate the provided text without making any additional modifications.
-
-                        4. Citation and Reference Keys:
-                           - Ensure all citation keys within \\cite{{}} and reference keys within \\ref{{}} remain unchanged. Do not translate or modify these keys.
-
-                        5. URLs and DOIs:
-                           - Do not translate URLs, DOIs, or any other links. Keep them in their original form.
-
-                        6. Mathematical Equations and Formulas:
-                           - Maintain all mathematical equations and formulas as they are in the original LaTeX. Do not translate code or LaTeX mathematical notation.
-
-                        7. Names:
-                           - Do not translate author names, personal names, or any other individual names. Keep these in their original English form.
-
-                        8. Consistency:
-                           - Ensure consistent terminology throughout the translation.
-
-                        9. Protection of LaTeX Commands:
-                            - Preserve line breaks (\\\\) and other formatting commands exactly as they appear in the original text.
-
-                        10. Avoid Misleading Translations:
-                            - Do not translate technical terms, product names, specialized concepts, examples, or personal names where translation could lead to a loss of meaning or context.
-
-                        11. JSON Structure:
-                            - Translate the content line by line, providing the translation in a JSON structure.
-                            For example:
-                              ```json
-                              translate : {{
-                                lines: [
-                                "Translated Line 1",
-                                "Translated Line 2"
-                              ]}}
-                              ```
-
-                        ### Paper Info:
-                        - Title : {paper_title}
-                        - Abstract : {paper_abstract}
-                        
-                        ### Response Example:
-                        #INPUT:
-                        ["\\n", "\\documentclass{{article}} % For LaTeX2e\\n", "\\usepackage{{colm2024_conference}}\\n", "\\n", "\\usepackage{{microtype}}\\n"]
-                        #OUTPUT:
-                        {{"translate": {{"lines": ["\\n", "\\documentclass{{article}} % For LaTeX2e\\n", "\\usepackage{{colm2024_conference}}", "\\n", "\\usepackage{{microtype}}\\n"]}}}}
-                        
-                        ### VERY IMPORTANT
-                        - DO NOT translate comments starting with "%" by arbitrarily merging them.
-                        - DO NOT break a sentence into multiple paragraphs.
-                        - Output the translated result in JSON format, without any other explanation.
-                        - It should be translated and output in the same form as the unconditional input.
-                        - Translate and output even single characters like '\\n', '{{', '/', '%', etc.
-                        """
-                     },
-                    {"role": "user", "content": f"{cleaned_text}"}
-                ]
+                messages=messages,
+                stream=True,
+                # Passed through extra_body so it also works with SDK versions that predate the parameter
+                extra_body={"prompt_cache_key": make_prompt_cache_key(paper_info, target_language)}
             )
+            break
+        except TRANSIENT_API_ERRORS as error:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            delay = RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, 1)
+            logging.warning(f"GPT API request failed ({type(error).__name__}). Retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+
+    content_parts = []
+    lines_key_count = 0
+    tail = ''  # 델타 경계에 걸친 '"lines"' 키도 셀 수 있도록 직전 델타의 끝부분 보관
+    async for event in stream:
+        if not event.choices:
+            continue
+        delta = event.choices[0].delta.content or ''
+        content_parts.append(delta)
+
+        window = tail + delta
+        lines_key_count += window.count('"lines"')
+        tail = window[-(len('"lines"') - 1):]
+        if lines_key_count > len(chunks):
+            await stream.close()
+            raise ValueError(f"Response contains more than the {len(chunks)} requested chunks.")
+
+    return parse_translation_content(''.join(content_parts))
+
+
+def make_chunk_cache_key(cleaned_chunk: list, paper_info: dict, target_language: str) -> str:
+    """Builds the translation cache key of a cleaned chunk."""
+    return translation_cache.make_key(orjson.dumps(cleaned_chunk).decode(), target_language, TRANSLATION_MODEL,
+                                      paper_info.get('title', ''), get_system_prompt(target_language))
+
+
+async def translate_cleaned_chunk(client: openai.AsyncOpenAI, cleaned_chunk: list, cache_key: str,
+                                  paper_info: dict, target_language: str = "Korean") -> list:
+    """Requests the translation of an already cleaned chunk, retrying until the line count matches."""
+    retry_attempts = 3  # Number of retry attempts
+    for attempt in range(retry_attempts):
+        try:
+            translated_chunks = await request_translation(client, [cleaned_chunk], paper_info, target_language)
+            translation_lines = translated_chunks[0] if len(translated_chunks) == 1 else None
 
-            translated_content = response.choices[0].message['content']
-            translation_result = json.loads(translated_content)
-            translation_lines = translation_result["translate"]['lines']
-            translated_line_count = len(translation_lines)
-
-            if translated_line_count != chunk_size:
-                time.sleep(1)  # Optional: wait before retrying
+            if not isinstance(translation_lines, list) or len(translation_lines) != len(cleaned_chunk):
+                await asyncio.sleep(1)  # Optional: wait before retrying
                 continue  # Retry the translation
 
-            return ''.join(translation_lines)
+            translation_cache.put(cache_key, translation_lines)
+            return translation_lines
 
+        except TRANSIENT_API_ERRORS:
+            raise  # request_translation has already backed off; retrying here would only add load
         except Exception as error:
             logging.error(f"Error during translation attempt {attempt + 1}: {error}")
             if attempt == retry_attempts - 1:
@@ -131,10 +662,141 @@ def translate_text(text: str, paper_info: dict, chunk_size: int, target_language
 
     raise Exception("Translation failed after multiple attempts.")
 
-def add_custom_font_to_tex(tex_file_path: str, font_name: str = "Noto Sans KR", mono_font_name: str = "Noto Sans KR"):
-    """텍스트 파일에 사용자 지정 폰트를 추가"""
+
+async def translate_batch(client: openai.AsyncOpenAI, chunks: list, paper_info: dict,
+                          target_language: str = "Korean") -> list:
+    """
+    Translates several chunks with a single GPT request.
+
+    Chunks whose translation comes back with a different line count are retried
+    one by one with translate_cleaned_chunk; chunks that still fail keep their original text.
+
+    Returns:
+    - A list of translated strings, in the same order as chunks.
+    """
+    translations = [None] * len(chunks)
+    pending = []
+
+    for idx, chunk in enumerate(chunks):
+        cleaned_chunk = [remove_latex_commands(line) for line in chunk]
+        cache_key = make_chunk_cache_key(cleaned_chunk, paper_info, target_language)
+        cached_lines = translation_cache.get(cache_key)
+        if cached_lines is not None:
+            translations[idx] = ''.join(cached_lines)
+        else:
+            pending.append((idx, cleaned_chunk, cache_key))
+
+    if len(pending) > 1:
+        try:
+            translated_chunks = await request_translation(client, [cleaned_chunk for _, cleaned_chunk, _ in pending],
+                                                          paper_info, target_language)
+        except TRANSIENT_API_ERRORS as error:
+            # Still failing after backing off: sending every chunk on its own would multiply the requests
+            logging.error(f"GPT API unavailable while translating {len(pending)} chunks, "
+                          f"keeping the original text: {error}")
+            for idx, _, _ in pending:
+                translations[idx] = ''.join(chunks[idx])
+            return translations
+        except Exception as error:
+            logging.error(f"Error during batched translation of {len(pending)} chunks: {error}")
+            translated_chunks = []
+
+        failed = []
+        for position, (idx, cleaned_chunk, cache_key) in enumerate(pending):
+            translation_lines = translated_chunks[position] if position < len(translated_chunks) else None
+            if isinstance(translation_lines, list) and len(translation_lines) == len(cleaned_chunk):
+                translation_cache.put(cache_key, translation_lines)
+                translations[idx] = ''.join(translation_lines)
+            else:
+                failed.append((idx, cleaned_chunk, cache_key))
+        pending = failed
+
+    for idx, cleaned_chunk, cache_key in pending:
+        try:
+            translation_lines = await translate_cleaned_chunk(client, cleaned_chunk, cache_key,
+                                                              paper_info, target_language)
+            translations[idx] = ''.join(translation_lines)
+        except Exception as e:
+            logging.error(f"Error translating chunk: {e}")
+            translations[idx] = ''.join(chunks[idx])  # Return original text in case of an error
+
+    return translations
+
+
+def is_trivial_chunk(chunk: list) -> bool:
+    """Returns True when every line is blank, a comment, a couple of characters or LaTeX plumbing with no prose."""
+    for line in chunk:
+        stripped = line.strip()
+        if len(stripped) <= 2 or stripped.startswith('%') or _LATEX_ONLY_RE.match(stripped):
+            continue
+        return False
+    return True
+
+
+def has_prose(text: str) -> bool:
+    """Returns True when text still contains a word once comments, math, references and command names are stripped."""
+    text = _LATEX_COMMENT_RE.sub('', text)
+    text = _MATH_RE.sub(' ', text)
+    text = _NON_PROSE_COMMAND_RE.sub(' ', text)
+    text = _COMMAND_NAME_RE.sub(' ', text)
+    return _PROSE_WORD_RE.search(text) is not None
+
+
+def is_untranslatable_tex_file(tex_file: TexFile) -> bool:
+    """Returns True for files without any prose outside tikz pictures (figure, macro and math-only inputs)."""
+    return not has_prose(_TIKZPICTURE_RE.sub(' ', ''.join(tex_file.lines)))
+
+
+def group_chunks_into_batches(file_line_chunks: list, max_tokens_per_request: int,
+                              max_chunks_per_request: int = 8) -> list:
+    """
+    Groups consecutive chunks so that each batch holds at most max_tokens_per_request
+    tokens and at most max_chunks_per_request chunks (many tiny chunks in one reply
+    make it more likely that the model mixes up chunk boundaries).
+    """
+    batches = []
+    current_batch = []
+    current_token_count = 0
+
+    for file_chunk_info in file_line_chunks:
+        chunk_token_count = count_tokens(''.join(file_chunk_info[2]))
+        if current_batch and (current_token_count + chunk_token_count > max_tokens_per_request
+                              or len(current_batch) >= max_chunks_per_request):
+            batches.append(current_batch)
+            current_batch = []
+            current_token_count = 0
+        current_batch.append(file_chunk_info)
+        current_token_count += chunk_token_count
+
+    if current_batch:
+        batches.append(current_batch)
+
+    return batches
+
+def write_text_atomically(file_path: str, text: str):
+    """임시 파일에 쓴 뒤 os.replace로 교체해 중간에 실패해도 원본이 깨지지 않도록 저장"""
+    write_lines_atomically(file_path, (text,))
+
+
+def write_lines_atomically(file_path: str, pieces):
+    """문자열 조각들을 하나로 합치지 않고 writelines로 임시 파일에 쓴 뒤 os.replace로 교체"""
+    tmp_path = file_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(pieces)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def add_custom_font_to_tex(tex_file_path: str, font_name: str = "Noto Sans KR", mono_font_name: str = "Noto Sans KR",
+                           contents: str = None):
+    """
+    텍스트 파일에 사용자 지정 폰트를 추가 (프리앰블만 줄 단위로 처리하고 본문은 블록 단위로 복사).
+    contents가 주어지면 파일을 다시 읽지 않고 그 내용에 폰트를 추가해 저장
+    """
     logging.info(f"Adding custom font '{font_name}' to TeX file: {tex_file_path}")
-    remove_cjk_related_lines(tex_file_path)
     font_setup = rf"""
         \usepackage{{kotex}}
         \usepackage{{xeCJK}}
@@ -142,162 +804,326 @@ def add_custom_font_to_tex(tex_file_path: str, font_name: str = "Noto Sans KR",
         \setCJKmonofont{{{mono_font_name}}}
         \xeCJKsetup{{CJKspace=true}}
         """
+    tmp_path = tex_file_path + '.tmp'
     try:
-        with open(tex_file_path, 'r+', encoding='utf-8') as file:
-            lines = file.readlines()
-            for i, line in enumerate(lines):
-                if line.startswith(r'\documentclass'):
-                    lines.insert(i + 1, font_setup)
+        source = io.StringIO(contents) if contents is not None else open(tex_file_path, 'r', encoding='utf-8')
+        with source as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+            # \documentclass 줄까지만 한 줄씩 처리
+            has_documentclass = False
+            for line in iter(src.readline, ''):
+                if _CJK_LINE_RE.match(line):
+                    continue
+                dst.write(line)
+                if _DOCUMENTCLASS_LINE_RE.match(line):
+                    has_documentclass = True
+                    break
+
+            # \documentclass 뒤부터 \begin{document}까지의 프리앰블을 읽어, 이미 폰트 설정이 들어간 파일이면
+            # 다시 넣지 않음 (중복 \usepackage{xeCJK} 등으로 프리앰블이 깨지는 것을 방지)
+            preamble = []
+            for line in iter(src.readline, ''):
+                preamble.append(line)
+                if '\\begin{document}' in line:
+                    break
+            if any(r'\setCJKmainfont' in line for line in preamble):
+                logging.debug("Custom font already present. Skipping insertion.")
+                dst.close()
+                if contents is not None:
+                    write_text_atomically(tex_file_path, contents)
+                return
+
+            if has_documentclass:
+                dst.write(font_setup)
+                dst.write(_CJK_LINE_RE.sub('', ''.join(preamble)))
+
+            # 나머지 본문은 줄 경계에 맞춘 약 1 MiB 블록 단위로 복사하면서 CJK 관련 줄만 제거
+            while True:
+                block = src.readlines(TEX_COPY_BUFSIZE)
+                if not block:
                     break
-            file.seek(0)
-            file.writelines(lines)
+                dst.write(_CJK_LINE_RE.sub('', ''.join(block)))
+        os.replace(tmp_path, tex_file_path)
         logging.debug("Custom font added successfully.")
     except Exception as e:
         logging.error(f"Failed to add custom font: {e}")
         raise
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
-def remove_cjk_related_lines(tex_file_path: str):
-    """텍스트 파일에서 CJK 관련 패키지와 설정을 제거"""
-    logging.info(f"Removing CJK related lines from TeX file: {tex_file_path}")
-
-    cjk_related_keywords = [
-        r'\usepackage{CJKutf8}',
-        r'\usepackage{kotex}',
-        r'\begin{CJK}',
-        r'\end{CJK}',
-        r'\CJKfamily',
-        r'\CJK@',
-        r'\CJKrmdefault',
-        r'\CJKsfdefault',
-        r'\CJKttdefault',
-    ]
-
+def prepare_tex_file(tex_file: TexFile, max_tokens_per_chunk: int) -> list:
+    """Backs up a scanned .tex file and splits it into (file_path, chunk_idx, chunk) entries for translation."""
+    file_path = tex_file.path
+    original_file_path = file_path + "_original"
     try:
-        with open(tex_file_path, 'r+', encoding='utf-8') as file:
-            lines = file.readlines()
-            new_lines = []
-            for line in lines:
-                if not any(keyword in line for keyword in cjk_related_keywords):
-                    new_lines.append(line)
-
-            file.seek(0)
-            file.writelines(new_lines)
-            file.truncate()
-
-        logging.debug("CJK related lines removed successfully.")
+        # Keep the original under a different name as a hard link (no bytes copied). The translated
+        # file is later swapped in with os.replace, so the link keeps pointing at the original content.
+        if not os.path.exists(original_file_path):
+            try:
+                os.link(file_path, original_file_path)
+            except OSError:
+                shutil.copyfile(file_path, original_file_path)
+
+        # Split the lines into safe chunks
+        chunks = chunk_lines_safely(tex_file.lines, max_tokens_per_chunk)
+        return [(file_path, idx, chunk) for idx, chunk in enumerate(chunks)]
+
     except Exception as e:
-        logging.error(f"Failed to remove CJK related lines: {e}")
-        raise
+        logging.error(f"Error backing up file {file_path}: {e}")
+        return []
 
-def process_and_translate_tex_files(directory: str, paper_info: dict, read_lines: int = 30,
-                                    target_language: str = "Korean", max_parallel_tasks: int = 8):
-    """Processes .tex files by splitting them into chunks and translating them in parallel, ensuring error handling."""
-    logging.info(f"Processing and translating lines in .tex files in directory: {directory}")
 
-    file_line_chunks = []
-    total_chunks = 0
+async def translate_batches(batches: list, paper_info: dict, target_language: str, total_chunks: int,
+                            max_parallel_tasks: int) -> list:
+    """Translates all batches concurrently, keeping at most max_parallel_tasks requests in flight."""
+    semaphore = asyncio.Semaphore(max_parallel_tasks)
+    completed_chunks = 0
 
-    # Split files into chunks of lines and save to a list
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".tex"):
-                file_path = os.path.join(root, file)
-                original_file_path = file_path + "_original"
-                logging.info(f"Reading file: {file_path}")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
+    async with make_openai_client() as client:
+        async def translate_chunks(batch):
+            nonlocal completed_chunks
+            async with semaphore:
+                translated_texts = await translate_batch(client, [chunk for _, _, chunk in batch],
+                                                         paper_info, target_language)
 
-                    # Save the original file with a different name
-                    with open(original_file_path, 'w', encoding='utf-8') as original_f:
-                        original_f.writelines(lines)
+            completed_chunks += len(batch)
+            progress = (completed_chunks / total_chunks) * 100
+            logging.info(f"Translation progress: {progress:.2f}% completed.")
+            return [(file_path, chunk_idx, translated_text)
+                    for (file_path, chunk_idx, _), translated_text in zip(batch, translated_texts)]
 
-                    # Split the lines into safe chunks
-                    chunks = chunk_lines_safely(lines, read_lines)
+        return await asyncio.gather(*(translate_chunks(batch) for batch in batches), return_exceptions=True)
 
-                    for idx, chunk in enumerate(chunks):
-                        file_line_chunks.append((file_path, idx, chunk))
-                    total_chunks += len(chunks)
 
-                    # Save the modified file after removing comments or making other changes
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.writelines(lines)
+def prefill_cache_with_batch_api(batches: list, paper_info: dict, target_language: str,
+                                 poll_interval: int = 30):
+    """
+    Translates all uncached chunks through the OpenAI Batch API and stores the valid results
+    in the translation cache. The Batch API costs about half as much as synchronous calls and
+    is not bound by the per-minute rate limits, but results can take minutes to hours.
+    Chunks that are missing or invalid in the batch output are left to the regular path.
+    """
+    pending_by_id = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        requests_path = os.path.join(work_dir, "batch_requests.jsonl")
+        with open(requests_path, 'wb') as f:
+            for batch_idx, batch in enumerate(batches):
+                pending = []
+                for _, _, chunk in batch:
+                    cleaned_chunk = [remove_latex_commands(line) for line in chunk]
+                    cache_key = make_chunk_cache_key(cleaned_chunk, paper_info, target_language)
+                    if translation_cache.get(cache_key) is None:
+                        pending.append((cleaned_chunk, cache_key))
+                if not pending:
+                    continue
+
+                custom_id = f"batch-{batch_idx}"
+                pending_by_id[custom_id] = pending
+                f.write(orjson.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": TRANSLATION_MODEL,
+                        "response_format": {"type": "json_object"},
+                        "messages": build_translation_messages([cleaned_chunk for cleaned_chunk, _ in pending],
+                                                               paper_info, target_language),
+                        "prompt_cache_key": make_prompt_cache_key(paper_info, target_language),
+                    },
+                }) + b'\n')
+
+        if not pending_by_id:
+            logging.info("All chunks are cached. Nothing to submit to the Batch API.")
+            return
+
+        client = make_openai_client(use_async=False)
+        with open(requests_path, 'rb') as f:
+            input_file = client.files.create(file=f, purpose="batch")
+
+    batch_job = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions",
+                                      completion_window="24h")
+    logging.info(f"Submitted {len(pending_by_id)} requests to the Batch API as {batch_job.id}.")
+
+    while batch_job.status not in ("completed", "failed", "expired", "cancelled"):
+        time.sleep(poll_interval)
+        batch_job = client.batches.retrieve(batch_job.id)
+        logging.info(f"Batch {batch_job.id} status: {batch_job.status}")
+
+    if batch_job.status != "completed" or not batch_job.output_file_id:
+        logging.error(f"Batch {batch_job.id} ended with status '{batch_job.status}'. Falling back to regular requests.")
+        return
 
-                except Exception as e:
-                    logging.error(f"Error reading or writing file {file_path}: {e}")
+    stored_chunks = 0
+    for line in client.files.content(batch_job.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+            pending = pending_by_id.get(record["custom_id"], [])
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            translated_chunks = parse_translation_content(response["body"]["choices"][0]["message"]["content"])
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logging.error(f"Skipping malformed Batch API result: {e}")
+            continue
+
+        for (cleaned_chunk, cache_key), translation_lines in zip(pending, translated_chunks):
+            if isinstance(translation_lines, list) and len(translation_lines) == len(cleaned_chunk):
+                translation_cache.put(cache_key, translation_lines)
+                stored_chunks += 1
+
+    logging.info(f"Batch API translated {stored_chunks} chunks.")
+
+
+def process_and_translate_tex_files(directory: str, paper_info: dict, max_tokens_per_chunk: int = 1500,
+                                    target_language: str = "Korean", max_parallel_tasks: int = 8,
+                                    max_tokens_per_request: int = 6000, max_chunks_per_request: int = 8,
+                                    tex_files: list = None, use_batch_api: bool = False,
+                                    main_tex_path: str = None, font_name: str = None):
+    """
+    Processes .tex files by splitting them into chunks and translating batches of chunks in parallel, ensuring error handling.
+    When main_tex_path and font_name are given, the custom font is added while the translated main file is written.
+    """
+    logging.info(f"Processing and translating lines in .tex files in directory: {directory}")
+
+    # Reuse the contents read by scan_tex_tree instead of walking and reading the tree again
+    if tex_files is None:
+        tex_files = scan_tex_tree(directory)
+
+    # Figure and macro files are left untouched: no backup, no requests, no rewrite
+    translatable_files = [tex_file for tex_file in tex_files if not is_untranslatable_tex_file(tex_file)]
+    if len(translatable_files) < len(tex_files):
+        logging.info(f"Skipping {len(tex_files) - len(translatable_files)}/{len(tex_files)} .tex files "
+                     f"with no translatable text.")
+    tex_files = translatable_files
+
+    file_line_chunks = [file_chunk_info for tex_file in tex_files
+                        for file_chunk_info in prepare_tex_file(tex_file, max_tokens_per_chunk)]
+    total_chunks = len(file_line_chunks)
 
     if total_chunks == 0:
         logging.warning("No lines to translate.")
         return
 
-    completed_chunks = 0
-
-    # Translate each chunk in parallel
-    def translate_chunk(file_chunk_info):
-        nonlocal completed_chunks
-        file_path, chunk_idx, chunk = file_chunk_info
-        try:
-            # Format the chunks as a list of dictionaries
-            formatted_chunk = [line for idx, line in enumerate(chunk)]
-            translated_text = translate_text(json.dumps(formatted_chunk), paper_info, len(chunk), target_language)
-        except Exception as e:
-            logging.error(f"Error translating chunk in file {file_path}: {e}")
-            translated_text = ''.join(chunk)  # Return original text in case of an error
-
-        completed_chunks += 1
-        progress = (completed_chunks / total_chunks) * 100
-        logging.info(f"Translation progress: {progress:.2f}% completed.")
-        return (file_path, chunk_idx, translated_text)
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel_tasks) as executor:
-        translated_pairs = list(executor.map(translate_chunk, file_line_chunks))
-
-    # Reassemble and save the translated content by file
-    file_contents = {}
-    for file_path, chunk_idx, translated_chunk in translated_pairs:
-        if file_path not in file_contents:
-            file_contents[file_path] = []
-        file_contents[file_path].append((chunk_idx, translated_chunk))
-
-    for file_path, chunks in file_contents.items():
-        # Sort chunks by their original index
-        sorted_chunks = sorted(chunks, key=lambda x: x[0])
-        translated_content = ''.join(chunk for _, chunk in sorted_chunks)
+    # Identical chunks (blank-line runs, repeated boilerplate) are sent only once per run,
+    # and chunks with nothing to translate (pure LaTeX plumbing) are not sent at all
+    chunk_texts = [''.join(chunk) for _, _, chunk in file_line_chunks]
+    unique_chunks = {}
+    translated_by_text = {}
+    trivial_chunk_count = 0
+    for chunk_text, file_chunk_info in zip(chunk_texts, file_line_chunks):
+        chunk = file_chunk_info[2]
+        if chunk_text in translated_by_text or is_trivial_chunk(chunk) or not has_prose(chunk_text):
+            translated_by_text.setdefault(chunk_text, ''.join(remove_latex_commands(line) for line in chunk))
+            trivial_chunk_count += 1
+        else:
+            unique_chunks.setdefault(chunk_text, file_chunk_info)
+    logging.info(f"Skipping {trivial_chunk_count}/{total_chunks} chunks with no translatable text.")
+
+    batches = group_chunks_into_batches(list(unique_chunks.values()), max_tokens_per_request,
+                                        max_chunks_per_request)
+    # Batch API 모드에서는 먼저 배치 작업으로 캐시를 채우고, 누락/오류 청크만 아래 일반 요청으로 번역
+    if use_batch_api and batches:
+        prefill_cache_with_batch_api(batches, paper_info, target_language)
+
+    batch_results = asyncio.run(translate_batches(batches, paper_info, target_language, len(unique_chunks),
+                                                  max_parallel_tasks)) if batches else []
+
+    for batch, result in zip(batches, batch_results):
+        if isinstance(result, BaseException):
+            logging.error(f"Error translating batch: {result}")
+            result = [(file_path, chunk_idx, ''.join(chunk)) for file_path, chunk_idx, chunk in batch]
+        for (_, _, chunk), (_, _, translated_text) in zip(batch, result):
+            translated_by_text[''.join(chunk)] = translated_text
+
+    # file_line_chunks is already grouped by file and ordered by chunk index, so each file's
+    # translations are streamed straight into its temp file without regrouping or sorting
+    for file_path, file_entries in itertools.groupby(zip(file_line_chunks, chunk_texts),
+                                                     key=lambda entry: entry[0][0]):
+        translated_chunks = (translated_by_text[chunk_text] for _, chunk_text in file_entries)
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(translated_content)
+            if file_path == main_tex_path and font_name:
+                # Insert the font setup in the same write so the main file is not rewritten again before compiling
+                add_custom_font_to_tex(file_path, font_name, contents=''.join(translated_chunks))
+            else:
+                write_lines_atomically(file_path, translated_chunks)
             logging.info(f"File translated and saved: {file_path}")
         except Exception as e:
             logging.error(f"Error writing translated content to {file_path}: {e}")
 
+    # Trim the cache only after every translated file is safely on disk
+    translation_cache.evict()
+
 
-def chunk_lines_safely(lines, lines_per_chunk):
+@functools.lru_cache(maxsize=None)
+def get_token_encoding():
+    """Returns the tiktoken encoding of the translation model."""
+    try:
+        return tiktoken.encoding_for_model(TRANSLATION_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    """Counts model tokens in text; special-token markers in the paper are counted as plain text."""
+    return len(get_token_encoding().encode(text, disallowed_special=()))
+
+
+def chunk_lines_safely(lines, max_tokens=1500):
     """
-    Safely splits the given lines into chunks of a specified number of lines,
-    excluding lines that are only newline characters.
+    Safely splits the given lines into chunks of roughly max_tokens model tokens,
+    so every request carries a similar amount of text regardless of line length.
+    A chunk is not closed inside a LaTeX environment (other than document) unless
+    it has grown past twice the budget. When the budget runs out, the chunk is cut
+    at the last paragraph, section or environment boundary if that keeps at least
+    half the budget, so related lines are translated together.
 
     Args:
     - lines: List of all lines in the text.
-    - lines_per_chunk: Number of lines to include in each chunk.
+    - max_tokens: Target number of tokens per chunk.
 
     Returns:
     - A list of chunks, where each chunk is a list of lines.
     """
     chunks = []
     current_chunk = []
-    current_line_count = 0
+    line_token_counts = []
+    current_token_count = 0
+    env_depth = 0
+    # Position in current_chunk of the last semantic boundary, and the token count before it
+    boundary = boundary_token_count = 0
 
     for line in lines:
+        line_token_count = count_tokens(line)
+
+        # A blank line or a sectioning command outside any environment starts a new unit
+        if current_chunk and env_depth == 0 and _SECTION_BREAK_RE.match(line):
+            boundary, boundary_token_count = len(current_chunk), current_token_count
+
+        # If the token budget would be exceeded, save the current chunk and start a new one
+        if current_chunk and current_token_count + line_token_count > max_tokens:
+            if env_depth == 0 or current_token_count + line_token_count > 2 * max_tokens:
+                # Cut at the last boundary unless that would leave a tiny chunk
+                cut = boundary if 2 * boundary_token_count >= max_tokens else len(current_chunk)
+                chunks.append(current_chunk[:cut])
+                current_chunk = current_chunk[cut:]
+                line_token_counts = line_token_counts[cut:]
+                current_token_count = sum(line_token_counts)
+                boundary = boundary_token_count = 0
 
         current_chunk.append(line)
-        current_line_count += 1
+        line_token_counts.append(line_token_count)
+        current_token_count += line_token_count
 
-        # If the specified number of lines is reached, save the current chunk and start a new one
-        if current_line_count >= lines_per_chunk:
-            chunks.append(current_chunk)
-            current_chunk = []
-            current_line_count = 0
+        # Track \begin{...}/\end{...} nesting, ignoring commented-out code
+        if '\\begin{' in line or '\\end{' in line:
+            code = _LATEX_COMMENT_RE.sub('', line)
+            env_depth = max(0, env_depth + len(_ENV_BEGIN_RE.findall(code)) - len(_ENV_END_RE.findall(code)))
+            # The line right after a closed top-level environment is also a good place to cut
+            if env_depth == 0 and '\\end{' in code:
+                boundary, boundary_token_count = len(current_chunk), current_token_count
 
     # If there are remaining lines, add them as the last chunk
     if current_chunk:
@@ -306,66 +1132,201 @@ def chunk_lines_safely(lines, lines_per_chunk):
     return chunks
 
 
-def extract_tar_gz(tar_file_path: str, extract_to: str):
-    """tar.gz 파일을 지정된 디렉토리로 추출"""
-    logging.info(f"Extracting tar.gz file: {tar_file_path} to {extract_to}")
+def is_safe_tar_member(member: tarfile.TarInfo) -> bool:
+    """압축 해제 위치 밖을 가리키는 경로나 링크인지 검사"""
+    if member.issym() or member.islnk() or os.path.isabs(member.name):
+        return False
+    return '..' not in member.name.replace('\\', '/').split('/')
+
 
+def extract_tar_stream(fileobj, extract_to: str):
+    """tar.gz 스트림을 임시 파일 없이 지정된 디렉토리로 바로 추출"""
+    logging.info(f"Extracting tar.gz stream to {extract_to}")
+
+    # 보안 패치(PEP 706)가 적용된 Python이면 'data' 필터로 권한/특수 파일도 정리
+    extract_kwargs = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
     try:
-        with tarfile.open(tar_file_path, 'r:gz') as tar_ref:
-            tar_ref.extractall(path=extract_to)
+        with tarfile.open(fileobj=fileobj, mode='r|gz', bufsize=TAR_STREAM_BUFSIZE) as tar_ref:
+            for member in tar_ref:
+                if not is_safe_tar_member(member):
+                    logging.warning(f"Skipping unsafe tar member: {member.name}")
+                    continue
+                tar_ref.extract(member, path=extract_to, **extract_kwargs)
         logging.debug("Extraction completed successfully.")
     except Exception as e:
-        logging.error(f"Failed to extract tar.gz file: {e}")
+        logging.error(f"Failed to extract tar.gz stream: {e}")
         raise
-def find_main_tex_file(directory: str) -> str:
-    """디렉토리에서 'documentclass'를 포함한 main .tex 파일 찾기"""
-    logging.info(f"Searching for main .tex file in directory: {directory}")
 
-    candidate_files = []
+
+def classify_tex_contents(contents: str) -> tuple:
+    """\\documentclass 포함 여부와 메인 파일 표지(\\begin{document}, \\usepackage 등) 포함 여부를 한 번에 확인"""
+    has_documentclass = has_main_markers = False
+    for match in _MAIN_RE.finditer(contents):
+        if match.group(1):
+            has_documentclass = True
+        else:
+            has_main_markers = True
+        if has_documentclass and has_main_markers:
+            break  # 대부분 프리앰블에서 모두 발견되므로 본문은 건너뜀
+    return has_documentclass, has_main_markers
+
+
+def read_tex_file(file_path: str):
+    """.tex 파일을 읽어 내용과 메인 파일 판별 정보를 TexFile로 반환 (읽기 실패 시 None)"""
+    logging.info(f"Reading file: {file_path}")
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            contents = f.read()
+            size = os.fstat(f.fileno()).st_size
+    except Exception as e:
+        logging.error(f"Failed to read file {file_path}: {e}")
+        return None
+
+    # classify_tex_contents는 두 표지를 모두 찾으면 바로 멈추므로 메인 파일은 프리앰블까지만 검사됨
+    has_documentclass, has_main_markers = classify_tex_contents(contents)
+    return TexFile(
+        path=file_path,
+        size=size,
+        lines=io.StringIO(contents).readlines(),
+        has_documentclass=has_documentclass,
+        has_main_markers=has_main_markers,
+    )
+
+
+def scan_tex_tree(directory: str) -> list:
+    """디렉토리의 모든 .tex 파일을 한 번만 탐색하고 병렬로 읽어 TexFile 목록으로 반환"""
+    logging.info(f"Scanning .tex files in directory: {directory}")
+
+    tex_paths = []
     for root, _, files in os.walk(directory):
         for file in files:
-            if file.endswith(".tex") and "_original" not in file:
-                candidate_files.append(os.path.join(root, file))
+            if file.endswith(".tex"):
+                tex_paths.append(os.path.join(root, file))
+
+    # 파일 읽기는 I/O 위주이므로 스레드로 병렬 처리
+    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        tex_files = list(executor.map(read_tex_file, tex_paths))
+
+    return [tex_file for tex_file in tex_files if tex_file is not None]
+
+
+def find_main_tex_file(directory: str, tex_files: list = None) -> str:
+    """디렉토리에서 'documentclass'를 포함한 main .tex 파일 찾기 (tex_files가 주어지면 다시 읽지 않음)"""
+    logging.info(f"Searching for main .tex file in directory: {directory}")
+
+    if tex_files is None:
+        tex_files = scan_tex_tree(directory)
+    candidate_files = [tex_file for tex_file in tex_files if "_original" not in os.path.basename(tex_file.path)]
 
     main_candidates = []
-    for file in candidate_files:
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                contents = f.read()
-                # \documentclass가 있는 파일을 찾기
-                if r'\documentclass' in contents:
-                    # 메인 파일인지 확인하기 위해 패키지 포함 여부와 환경 설정 등을 확인
-                    if any(keyword in contents for keyword in [r'\begin{document}', r'\usepackage', r'\title', r'\author']):
-                        logging.debug(f"Main candidate .tex file found: {file}")
-                        main_candidates.append(file)
-        except Exception as e:
-            logging.error(f"Failed to read file {file}: {e}")
+    for tex_file in candidate_files:
+        # \documentclass가 있고, 패키지 포함 여부와 환경 설정 등으로 메인 파일인지 확인
+        if tex_file.has_documentclass and tex_file.has_main_markers:
+            logging.debug("Main candidate .tex file found: %s", tex_file.path)
+            main_candidates.append(tex_file.path)
 
     # main 후보들 중 첫 번째 파일을 반환
     if main_candidates:
-        logging.debug(f"Selected main .tex file: {main_candidates[0]}")
+        logging.debug("Selected main .tex file: %s", main_candidates[0])
         return main_candidates[0]
 
     # 메인 파일 후보가 없으면, 크기가 가장 큰 .tex 파일 반환
     if candidate_files:
-        main_tex = max(candidate_files, key=os.path.getsize, default=None)
-        logging.debug(f"No clear main file found, selected by size: {main_tex}")
+        main_tex = max(candidate_files, key=lambda tex_file: tex_file.size).path
+        logging.debug("No clear main file found, selected by size: %s", main_tex)
         return main_tex
 
     logging.warning("No .tex files found.")
     return None
 
 
-def compile_main_tex(directory: str, arxiv_id: str, font_name: str = "Noto Sans KR"):
-    """메인 .tex 파일을 컴파일하여 PDF 생성"""
+def compile_main_tex(directory: str, arxiv_id: str, font_name: str = "Noto Sans KR", main_tex_path: str = None):
+    """메인 .tex 파일을 컴파일하여 PDF 생성 (main_tex_path를 모르면 디렉토리에서 찾음)"""
     logging.info(f"Compiling main .tex file in directory: {directory}")
 
-    main_tex_path = find_main_tex_file(directory)
+    # tmpfs(/dev/shm)가 있으면 복사본을 RAM 디스크에서 컴파일해 .aux/.log 등 중간 파일 I/O를 줄임
+    if os.path.isdir(RAM_DISK_DIR) and os.access(RAM_DISK_DIR, os.W_OK):
+        with tempfile.TemporaryDirectory(prefix="arxiv_", dir=RAM_DISK_DIR) as ram_dir:
+            build_dir = os.path.join(ram_dir, os.path.basename(directory))
+            try:
+                # *_original 백업은 컴파일에 쓰이지 않고, copytree는 하드 링크를 유지하지 않으므로 복사하지 않음
+                shutil.copytree(directory, build_dir, ignore=shutil.ignore_patterns('*_original'))
+            except OSError as e:
+                logging.warning(f"Failed to copy sources to RAM disk, compiling on disk instead: {e}")
+            else:
+                build_main_tex_path = None
+                if main_tex_path:
+                    build_main_tex_path = os.path.join(build_dir, os.path.relpath(main_tex_path, directory))
+                final_pdf_path = compile_main_tex_in_place(build_dir, arxiv_id, font_name, build_main_tex_path)
+                if final_pdf_path is None:
+                    copy_build_logs(build_dir, directory)
+                return final_pdf_path
+
+    return compile_main_tex_in_place(directory, arxiv_id, font_name, main_tex_path)
+
+
+def copy_build_logs(build_dir: str, directory: str):
+    """RAM 디스크에서 실패한 빌드의 .log/.buildlog 파일을 디버깅용으로 원래 디렉토리에 복사"""
+    for root, _, files in os.walk(build_dir):
+        for file in files:
+            if file.endswith(('.log', '.buildlog')):
+                target_path = os.path.join(directory, os.path.relpath(os.path.join(root, file), build_dir))
+                try:
+                    shutil.copyfile(os.path.join(root, file), target_path)
+                    logging.info(f"Build log kept for debugging: {target_path}")
+                except OSError as e:
+                    logging.warning(f"Failed to copy build log {file}: {e}")
+
+
+def compile_main_tex_in_place(directory: str, arxiv_id: str, font_name: str = "Noto Sans KR",
+                              main_tex_path: str = None):
+    """지정된 디렉토리에서 메인 .tex 파일을 그 자리에서 컴파일"""
+    main_tex_path = prepare_main_tex(directory, font_name, main_tex_path)
+    if main_tex_path:
+        return compile_tex_to_pdf(main_tex_path, arxiv_id, compile_twice=True)
+
+    logging.error("Main .tex file not found. Compilation aborted.")
+    return None
+
+
+def prepare_main_tex(directory: str, font_name: str = "Noto Sans KR", main_tex_path: str = None):
+    """메인 .tex 파일을 찾고 (한 번만) 사용자 지정 폰트를 추가한 뒤 경로를 반환"""
+    if main_tex_path is None:
+        main_tex_path = find_main_tex_file(directory)
     if main_tex_path:
         add_custom_font_to_tex(main_tex_path, font_name)
-        compile_tex_to_pdf(main_tex_path, arxiv_id, compile_twice=True)
-    else:
-        logging.error("Main .tex file not found. Compilation aborted.")
+    return main_tex_path
+
+def latex_log_requests_rerun(log_path: str) -> bool:
+    """xelatex 로그에 재실행(Rerun) 요청이 있는지 확인"""
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return 'Rerun' in f.read()
+    except OSError:
+        return True  # 로그를 확인할 수 없으면 기존처럼 한 번 더 실행
+
+
+def log_latex_errors(log_path: str):
+    """xelatex 로그에서 '!'로 시작하는 오류 줄만 디버그 로그로 출력"""
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if line.startswith('!'):
+                    logging.debug("LaTeX error: %s", line.rstrip())
+    except OSError as e:
+        logging.debug("Failed to read LaTeX log %s: %s", log_path, e)
+
+
+def log_build_output_tail(build_log_path: str, max_bytes: int = 4096):
+    """컴파일러 콘솔 출력 파일의 마지막 max_bytes만 오류 로그로 출력"""
+    try:
+        with open(build_log_path, 'rb') as f:
+            f.seek(max(0, os.fstat(f.fileno()).st_size - max_bytes))
+            tail = f.read().decode('utf-8', errors='replace')
+        logging.error("LaTeX build output (last %d bytes):\n%s", max_bytes, tail)
+    except OSError as e:
+        logging.debug("Failed to read LaTeX build output %s: %s", build_log_path, e)
+
 
 def compile_tex_to_pdf(tex_file_path: str, arxiv_id: str, compile_twice: bool = True):
     """텍스트 파일을 PDF로 컴파일"""
@@ -374,71 +1335,123 @@ def compile_tex_to_pdf(tex_file_path: str, arxiv_id: str, compile_twice: bool =
     tex_dir = os.path.dirname(tex_file_path)
     tex_file = os.path.basename(tex_file_path)
 
+    output_pdf = os.path.join(tex_dir, tex_file.replace(".tex", ".pdf"))
+    log_path = os.path.join(tex_dir, tex_file.replace(".tex", ".log"))
+    build_log_path = os.path.join(tex_dir, tex_file.replace(".tex", ".buildlog"))
+
     try:
-        for _ in range(2 if compile_twice else 1):
-            result = subprocess.run(
-                ['xelatex', '-interaction=nonstopmode',tex_file],
-                cwd=tex_dir,
-                encoding='utf-8'
-            )
-            logging.info(f"xelatex output: {result.stdout}")
-            logging.info(f"xelatex errors: {result.stderr}")
+        # 콘솔 출력은 파이프로 받지 않고 파일로 바로 보내, 실패했을 때만 끝부분을 읽어 출력
+        with open(build_log_path, 'wb') as build_log:
+            if shutil.which('latexmk'):
+                # latexmk는 참조/목차가 안정될 때까지 필요한 횟수만큼만 xelatex를 다시 실행
+                returncode = subprocess.call(
+                    # -norc: 논문 소스에 들어 있을 수 있는 latexmkrc(Perl 코드)를 실행하지 않음
+                    ['latexmk', '-norc', '-xelatex', '-f', '-interaction=nonstopmode', tex_file],
+                    cwd=tex_dir,
+                    stdout=build_log,
+                    stderr=subprocess.STDOUT
+                )
+                logging.info(f"latexmk finished with exit code {returncode}")
+            else:
+                for pass_idx in range(2 if compile_twice else 1):
+                    returncode = subprocess.call(
+                        ['xelatex', '-interaction=nonstopmode', tex_file],
+                        cwd=tex_dir,
+                        stdout=build_log,
+                        stderr=subprocess.STDOUT
+                    )
+                    logging.info(f"xelatex pass {pass_idx + 1} finished with exit code {returncode}")
+                    # 치명적 오류로 PDF가 없거나, 참조 갱신(Rerun) 요청이 없으면 두 번째 실행은 생략
+                    if returncode != 0 and not os.path.exists(output_pdf):
+                        break
+                    if not latex_log_requests_rerun(log_path):
+                        break
+
+        if returncode != 0:
+            log_build_output_tail(build_log_path)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                log_latex_errors(log_path)
 
-        output_pdf = os.path.join(tex_dir, tex_file.replace(".tex", ".pdf"))
         if os.path.exists(output_pdf):
             current_dir = os.getcwd()
             final_pdf_path = os.path.join(current_dir, f"{arxiv_id}.pdf")
-            os.rename(output_pdf, final_pdf_path)
+            shutil.move(output_pdf, final_pdf_path)
             logging.info(f"PDF compiled and saved as: {final_pdf_path}")
-        else:
-            logging.error("PDF output not found after compilation.")
+            return final_pdf_path
+
+        logging.error("PDF output not found after compilation.")
+        return None
     except Exception as e:
         logging.error(f"Failed to compile TeX file: {e}")
         raise
 
 
-def download_arxiv_intro_and_tex(arxiv_id: str, download_dir: str, target_language: str = "Korean",
-                                 font_name: str = "Noto Sans KR"):
-    """arXiv 논문 정보 및 텍스트 파일을 다운로드하고 번역"""
-    logging.info(f"Downloading and processing arXiv paper: {arxiv_id}")
-
+def fetch_arxiv_metadata(arxiv_id: str) -> dict:
+    """arXiv API에서 논문 제목과 초록을 가져옴"""
     arxiv_url = f"https://export.arxiv.org/api/query?id_list={arxiv_id}"
 
+    # 이전에 받은 응답이 있으면 조건부 요청을 보내 304(변경 없음)일 때 캐시를 사용
     try:
-        response = requests.get(arxiv_url)
-        response.raise_for_status()
+        response = http_session.get(arxiv_url, headers=http_cache.conditional_headers(arxiv_url))
+        if response.status_code == 304:
+            logging.info("ArXiv metadata not modified. Using cached copy.")
+            with http_cache.open_body(arxiv_url) as f:
+                metadata = f.read()
+        else:
+            response.raise_for_status()
+            metadata = response.content
+            with http_cache.open_writer(arxiv_url, response.headers) as sink:
+                if sink is not None:
+                    sink.write(metadata)
     except requests.RequestException as e:
         logging.error(f"Failed to fetch arXiv metadata: {e}")
         raise
 
-    soup = BeautifulSoup(response.content, 'xml')
-    entry = soup.find('entry')
-    if not entry:
+    # 제목과 초록 두 필드만 필요하므로 lxml로 Atom 피드를 직접 파싱
+    entry = etree.fromstring(metadata).find('atom:entry', ARXIV_ATOM_NS)
+    if entry is None:
         logging.error("ArXiv entry not found.")
         raise ValueError("ArXiv entry not found.")
 
     paper_info = {
-        "title": entry.find('title').text,
-        "abstract": entry.find('summary').text
+        "title": entry.findtext('atom:title', namespaces=ARXIV_ATOM_NS),
+        "abstract": entry.findtext('atom:summary', namespaces=ARXIV_ATOM_NS)
     }
-    logging.debug(f"Paper info: {paper_info}")
+    logging.debug("Paper info: %s", paper_info)
+    return paper_info
 
-    tar_url = f"https://arxiv.org/src/{arxiv_id}"
-    tar_file_path = os.path.join(download_dir, f"{arxiv_id}.tar.gz")
 
-    os.makedirs(download_dir, exist_ok=True)
+def download_and_extract_source(arxiv_id: str, extract_to: str):
+    """arXiv 소스 tar.gz를 내려받으면서 바로 extract_to에 추출"""
+    tar_url = f"https://arxiv.org/src/{arxiv_id}"
 
+    # tar.gz는 응답 스트림에서 바로 추출하고, 검증자(ETag 등)가 있으면 추출과 동시에 캐시에 기록
     try:
-        with requests.get(tar_url, stream=True) as r:
-            r.raise_for_status()
-            with open(tar_file_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        logging.info(f"Downloaded tar.gz file: {tar_file_path}")
+        with http_session.get(tar_url, stream=True, headers=http_cache.conditional_headers(tar_url)) as r:
+            if r.status_code == 304:
+                logging.info("Source tarball not modified. Extracting cached copy.")
+                with http_cache.open_body(tar_url) as f:
+                    extract_tar_stream(f, extract_to)
+            else:
+                r.raise_for_status()
+                r.raw.decode_content = True
+                with http_cache.open_writer(tar_url, r.headers) as sink:
+                    tee = TeeReader(r.raw, sink)
+                    extract_tar_stream(tee, extract_to)
+                    # tar 종료 블록 뒤의 나머지 바이트까지 읽어 캐시 파일을 완전하게 유지
+                    while tee.sink is not None and tee.read(TAR_STREAM_BUFSIZE):
+                        pass
+                logging.info(f"Downloaded and extracted source tarball: {tar_url}")
     except requests.RequestException as e:
         logging.error(f"Failed to download arXiv source tarball: {e}")
         raise
 
+
+def download_arxiv_intro_and_tex(arxiv_id: str, download_dir: str, target_language: str = "Korean",
+                                 font_name: str = "Noto Sans KR", use_batch_api: bool = False):
+    """arXiv 논문 정보 및 텍스트 파일을 다운로드하고 번역"""
+    logging.info(f"Downloading and processing arXiv paper: {arxiv_id}")
+
     extract_to = os.path.join(download_dir, arxiv_id)
 
     # 기존 arxiv_id 폴더가 존재하면 삭제
@@ -447,16 +1460,46 @@ def download_arxiv_intro_and_tex(arxiv_id: str, download_dir: str, target_langua
         shutil.rmtree(extract_to)
 
     os.makedirs(extract_to, exist_ok=True)
+    http_cache.sweep()
+
+    # 메타데이터와 소스는 서로 독립적이므로, 소스를 받는 동안 메타데이터 요청과 파싱을 함께 진행
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        source_future = executor.submit(download_and_extract_source, arxiv_id, extract_to)
+        paper_info = fetch_arxiv_metadata(arxiv_id)
+        source_future.result()
+
+    # 트리를 한 번만 읽어 번역과 메인 파일 탐색에 함께 사용
+    tex_files = scan_tex_tree(extract_to)
+    main_tex_path = find_main_tex_file(extract_to, tex_files)
+    process_and_translate_tex_files(extract_to, paper_info, target_language=target_language, tex_files=tex_files,
+                                    use_batch_api=use_batch_api, main_tex_path=main_tex_path, font_name=font_name)
+
+    # 번역 결과가 이전과 같으면 컴파일하지 않고 캐시된 PDF를 사용
+    pdf_cache.sweep()
+    pdf_cache_key = pdf_cache.make_key(extract_to, arxiv_id, font_name)
+    cached_pdf_path = pdf_cache.get(pdf_cache_key)
+    if cached_pdf_path:
+        final_pdf_path = os.path.join(os.getcwd(), f"{arxiv_id}.pdf")
+        shutil.copyfile(cached_pdf_path, final_pdf_path)
+        logging.info(f"PDF restored from cache: {final_pdf_path}")
+        return
 
-    extract_tar_gz(tar_file_path, extract_to)
-    process_and_translate_tex_files(extract_to, paper_info, target_language=target_language)
-    compile_main_tex(extract_to, arxiv_id, font_name)
+    final_pdf_path = compile_main_tex(extract_to, arxiv_id, font_name, main_tex_path)
+    if final_pdf_path:
+        pdf_cache.put(pdf_cache_key, final_pdf_path)
 
 if __name__ == "__main__":
     # GPT API 호출을 위한 설정
     openai.api_key = 'OPENAI_API_KEY'  # 여기에 실제 API 키를 입력하세요.
 
-    arxiv_input = input("Enter ArXiv ID or URL: ")
+    parser = argparse.ArgumentParser(description="arXiv 논문을 번역하여 PDF로 생성")
+    parser.add_argument("arxiv", nargs="?", help="arXiv ID 또는 URL (생략하면 입력을 요청)")
+    parser.add_argument("--batch", action="store_true",
+                        help="OpenAI Batch API로 번역 (비용 약 50%% 절감, 완료까지 수 분~수 시간 소요)")
+    args = parser.parse_args()
+
+    arxiv_input = args.arxiv or input("Enter ArXiv ID or URL: ")
     arxiv_id = extract_arxiv_id(arxiv_input)
     download_dir = 'arxiv_downloads'
-    download_arxiv_intro_and_tex(arxiv_id, download_dir, target_language="Korean", font_name="Noto Sans KR")
+    download_arxiv_intro_and_tex(arxiv_id, download_dir, target_language="Korean", font_name="Noto Sans KR",
+                                 use_batch_api=args.batch)